@@ -1,53 +1,139 @@
 import os
+import asyncio
+import atexit
 import logging
+import queue
+import threading
 import time
-from datetime import datetime
-from typing import Dict, Any
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Any, List, Tuple
 
-import pandas as pd
+import msgspec
 import numpy as np
-from fastapi import FastAPI, APIRouter, HTTPException, Request
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.openapi.utils import get_openapi
+from fastapi.responses import JSONResponse, ORJSONResponse
 from pydantic import BaseModel, Field
+from typing_extensions import Annotated
 import uvicorn
 
-from ml.data import apply_label, process_data
-from ml.model import inference, load_model
+from ml.data import apply_label, assemble_features
+from ml.model import forest_predict_proba, load_model
 
-# Configure logging
-logging.basicConfig(
-    level=getattr(logging, os.getenv('LOG_LEVEL', 'INFO')),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configure logging: records are queued by the caller and written to stderr
+# by a background listener thread, keeping stream I/O off the request path.
+# The module can be imported twice in one process (as __mp_main__ and main in
+# spawned workers), so reuse an installed QueueHandler instead of adding a
+# second handler and listener thread.
+root_logger = logging.getLogger()
+root_logger.setLevel(getattr(logging, os.getenv('LOG_LEVEL', 'INFO')))
+queue_handler = next((h for h in root_logger.handlers if isinstance(h, QueueHandler)), None)
+if queue_handler is None:
+    log_handler = logging.StreamHandler()
+    log_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    log_queue = queue.Queue(-1)
+    log_listener = QueueListener(log_queue, log_handler)
+    log_listener.start()
+    atexit.register(log_listener.stop)
+    queue_handler = QueueHandler(log_queue)
+root_logger.handlers[:] = [queue_handler]
 logger = logging.getLogger(__name__)
 
-# Global variables for metrics
+# Global variables for metrics; only touched from the event loop thread
 request_count = 0
 model_predictions = {'>50K': 0, '<=50K': 0}
 start_time = time.time()
 
-# Pydantic models
-class Data(BaseModel):
+# (epoch second, ISO string) of the most recently formatted timestamp
+_timestamp_cache = (0, "")
+
+
+def utc_timestamp() -> str:
+    """Current UTC time as an ISO 8601 string, formatted at most once per second."""
+    global _timestamp_cache
+    now = int(time.time())
+    second, formatted = _timestamp_cache
+    if now != second:
+        formatted = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now))
+        _timestamp_cache = (now, formatted)
+    return formatted
+
+# Micro-batching configuration
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', '32'))
+MAX_WAIT_MS = float(os.getenv('MAX_WAIT_MS', '5'))
+
+# Largest number of records accepted by a single /v1/predict/batch request
+MAX_REQUEST_ROWS = int(os.getenv('MAX_REQUEST_ROWS', '256'))
+
+# Number of distinct inputs whose predictions are kept in the LRU cache (0 disables it)
+PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', '4096'))
+
+# Threads used by the forest when scoring a batch (-1 uses all cores). Defaults
+# to 1 because production runs several worker processes per host
+MODEL_N_JOBS = int(os.getenv('MODEL_N_JOBS', '1'))
+
+# Batches smaller than this walk the compiled trees directly instead of going
+# through the forest's joblib dispatch
+PARALLEL_MIN_ROWS = int(os.getenv('PARALLEL_MIN_ROWS', '16'))
+
+# Request model, decoded and validated by msgspec straight from the request body
+class Data(msgspec.Struct, rename={
+    "education_num": "education-num",
+    "marital_status": "marital-status",
+    "capital_gain": "capital-gain",
+    "capital_loss": "capital-loss",
+    "hours_per_week": "hours-per-week",
+    "native_country": "native-country",
+}):
     """Input data model for census income prediction."""
-    age: int = Field(..., example=37, description="Age of the individual")
-    workclass: str = Field(..., example="Private", description="Type of work class")
-    fnlgt: int = Field(..., example=178356, description="Final weight")
-    education: str = Field(..., example="HS-grad", description="Education level")
-    education_num: int = Field(..., example=10, alias="education-num", description="Numeric education level")
-    marital_status: str = Field(
-        ..., example="Married-civ-spouse", alias="marital-status",
-        description="Marital status"
-    )
-    occupation: str = Field(..., example="Prof-specialty", description="Occupation type")
-    relationship: str = Field(..., example="Husband", description="Relationship status")
-    race: str = Field(..., example="White", description="Race")
-    sex: str = Field(..., example="Male", description="Gender")
-    capital_gain: int = Field(..., example=0, alias="capital-gain", description="Capital gains")
-    capital_loss: int = Field(..., example=0, alias="capital-loss", description="Capital losses")
-    hours_per_week: int = Field(..., example=40, alias="hours-per-week", description="Hours worked per week")
-    native_country: str = Field(..., example="United-States", alias="native-country", description="Native country")
+    age: Annotated[int, msgspec.Meta(examples=[37], description="Age of the individual")]
+    workclass: Annotated[str, msgspec.Meta(examples=["Private"], description="Type of work class")]
+    fnlgt: Annotated[int, msgspec.Meta(examples=[178356], description="Final weight")]
+    education: Annotated[str, msgspec.Meta(examples=["HS-grad"], description="Education level")]
+    education_num: Annotated[int, msgspec.Meta(examples=[10], description="Numeric education level")]
+    marital_status: Annotated[str, msgspec.Meta(examples=["Married-civ-spouse"], description="Marital status")]
+    occupation: Annotated[str, msgspec.Meta(examples=["Prof-specialty"], description="Occupation type")]
+    relationship: Annotated[str, msgspec.Meta(examples=["Husband"], description="Relationship status")]
+    race: Annotated[str, msgspec.Meta(examples=["White"], description="Race")]
+    sex: Annotated[str, msgspec.Meta(examples=["Male"], description="Gender")]
+    capital_gain: Annotated[int, msgspec.Meta(examples=[0], description="Capital gains")]
+    capital_loss: Annotated[int, msgspec.Meta(examples=[0], description="Capital losses")]
+    hours_per_week: Annotated[int, msgspec.Meta(examples=[40], description="Hours worked per week")]
+    native_country: Annotated[str, msgspec.Meta(examples=["United-States"], description="Native country")]
 
+# strict=False accepts numeric strings such as "37" for int fields, as the
+# previous Pydantic model did
+data_decoder = msgspec.json.Decoder(Data, strict=False)
+batch_decoder = msgspec.json.Decoder(List[Data], strict=False)
+
+
+async def parse_data(request: Request) -> Data:
+    """Decode a Data payload from the raw body, answering 422 when it is invalid."""
+    try:
+        return data_decoder.decode(await request.body())
+    except msgspec.DecodeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+async def parse_batch(request: Request) -> List[Data]:
+    """Decode a non-empty JSON array of Data payloads, answering 422 when it is invalid."""
+    try:
+        rows = batch_decoder.decode(await request.body())
+    except msgspec.DecodeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if not rows:
+        raise HTTPException(status_code=422, detail="Expected at least one record")
+    if len(rows) > MAX_REQUEST_ROWS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(rows)} records exceeds the limit of {MAX_REQUEST_ROWS}"
+        )
+    return rows
+
+# Pydantic response models
 class PredictionResponse(BaseModel):
     """Response model for predictions."""
     prediction: str = Field(..., description="Income prediction: '>50K' or '<=50K'")
@@ -55,6 +141,21 @@ class PredictionResponse(BaseModel):
     model_version: str = Field(..., description="Version of the model used")
     timestamp: str = Field(..., description="Timestamp of the prediction")
 
+class ValidationErrorResponse(BaseModel):
+    """Response model for request bodies that fail decoding or validation."""
+    detail: str = Field(..., description="msgspec error message, including the path of the offending field")
+
+class BatchPrediction(BaseModel):
+    """A single entry of a batch prediction response."""
+    prediction: str = Field(..., description="Income prediction: '>50K' or '<=50K'")
+    confidence: float = Field(..., description="Model confidence score")
+
+class BatchPredictionResponse(BaseModel):
+    """Response model for batch predictions."""
+    predictions: List[BatchPrediction] = Field(..., description="Predictions in request order")
+    model_version: str = Field(..., description="Version of the model used")
+    timestamp: str = Field(..., description="Timestamp of the predictions")
+
 class HealthResponse(BaseModel):
     """Response model for health check."""
     status: str = Field(..., description="Service health status")
@@ -78,6 +179,8 @@ try:
     
     encoder = load_model(encoder_path)
     model = load_model(model_path)
+    # Fan tree evaluation across threads; needs no retraining
+    model.n_jobs = MODEL_N_JOBS
     model_loaded = True
     logger.info("Models loaded successfully")
 except Exception as e:
@@ -86,6 +189,165 @@ except Exception as e:
     encoder = None
     model = None
 
+# Model input columns, in the order process_data produced them at training time:
+# continuous columns first, then the one-hot encoded categorical columns
+continuous_fields = [
+    "age",
+    "fnlgt",
+    "education_num",
+    "capital_gain",
+    "capital_loss",
+    "hours_per_week",
+]
+categorical_fields = [
+    "workclass",
+    "education",
+    "marital_status",
+    "occupation",
+    "relationship",
+    "race",
+    "sex",
+    "native_country",
+]
+feature_fields = continuous_fields + categorical_fields
+n_continuous = len(continuous_fields)
+
+# One-hot lookup tables: per categorical field, a {category: column} dict and
+# the offset of that field's block within the encoded columns
+if model_loaded:
+    category_index = [
+        {category: i for i, category in enumerate(categories)}
+        for categories in encoder.categories_
+    ]
+    category_offsets = np.cumsum([0] + [len(c) for c in encoder.categories_])
+    n_features = n_continuous + int(category_offsets[-1])
+else:
+    category_index = []
+    category_offsets = np.zeros(1, dtype=int)
+    n_features = 0
+
+# Queue of (future, Data) pairs awaiting batched inference, created at startup
+prediction_queue = None
+batch_worker_task = None
+
+# Thread pool for inference offloads, created at startup
+inference_executor = None
+
+# Per-thread scratch feature matrix, reused across batches
+scratch = threading.local()
+
+# LRU cache of (label, confidence) keyed on the tuple of input field values
+prediction_cache: "OrderedDict[tuple, Tuple[str, float]]" = OrderedDict()
+
+
+def category_codes(row: Data) -> List[int]:
+    """Look up the position of each categorical value, -1 when unknown."""
+    return [
+        index.get(getattr(row, field), -1)
+        for field, index in zip(categorical_fields, category_index)
+    ]
+
+
+def feature_buffer(n_rows: int) -> np.ndarray:
+    """Return an (n_rows, n_features) view of this thread's scratch matrix."""
+    buffer = getattr(scratch, "features", None)
+    if buffer is None or len(buffer) < n_rows:
+        buffer = np.empty((max(n_rows, MAX_BATCH_SIZE), n_features), dtype=np.float32)
+        scratch.features = buffer
+    return buffer[:n_rows]
+
+
+def predict_batch(rows: List[Data]) -> List[Tuple[str, float]]:
+    """Run one vectorized prediction over a batch of request rows.
+
+    The feature matrix is filled straight from the request objects, skipping
+    the DataFrame round trip through process_data.
+    """
+    data_processed = assemble_features(
+        np.array([[getattr(row, field) for field in continuous_fields] for row in rows]),
+        np.array([category_codes(row) for row in rows], dtype=np.intp),
+        category_offsets[:-1],
+        feature_buffer(len(rows))
+    )
+
+    if len(rows) < PARALLEL_MIN_ROWS:
+        prediction_proba = forest_predict_proba(model, data_processed)
+    else:
+        prediction_proba = model.predict_proba(data_processed)
+    predictions = model.classes_[np.argmax(prediction_proba, axis=1)]
+
+    return [
+        (apply_label([prediction]), float(np.max(proba)))
+        for prediction, proba in zip(predictions, prediction_proba)
+    ]
+
+
+async def batch_predictions():
+    """Coalesce queued prediction requests and score them in batches.
+
+    Waits for the first pending request, then keeps collecting until either
+    MAX_BATCH_SIZE requests are queued or MAX_WAIT_MS has elapsed.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await prediction_queue.get()]
+        deadline = loop.time() + MAX_WAIT_MS / 1000
+        while len(batch) < MAX_BATCH_SIZE:
+            # Take whatever is already queued without a wait_for round-trip per item
+            while len(batch) < MAX_BATCH_SIZE and not prediction_queue.empty():
+                batch.append(prediction_queue.get_nowait())
+            if len(batch) == MAX_BATCH_SIZE:
+                break
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(prediction_queue.get(), timeout=timeout))
+            except asyncio.TimeoutError:
+                break
+
+        futures = [future for future, _ in batch]
+        try:
+            # Score in a worker thread so the event loop keeps accepting requests
+            results = await loop.run_in_executor(inference_executor, predict_batch, [row for _, row in batch])
+        except Exception as e:
+            logger.error(f"Batch prediction failed: {e}")
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for future, result in zip(futures, results):
+                if not future.done():
+                    future.set_result(result)
+
+async def get_prediction(data: Data, cache_result: bool = True) -> Tuple[str, float]:
+    """Return the (label, confidence) for a request, serving repeats from the cache.
+
+    With cache_result=False a miss is not inserted, so bulk requests cannot
+    evict the entries that repeated single predictions rely on.
+    """
+    key = tuple(getattr(data, field) for field in feature_fields)
+    cached = prediction_cache.get(key)
+    if cached is not None:
+        prediction_cache.move_to_end(key)
+        return cached
+
+    loop = asyncio.get_running_loop()
+    if prediction_queue is None:
+        # Batch worker not running (e.g. startup events skipped), score directly
+        result = (await loop.run_in_executor(inference_executor, predict_batch, [data]))[0]
+    else:
+        # Hand the row to the batch worker and wait for its result
+        future = loop.create_future()
+        await prediction_queue.put((future, data))
+        result = await future
+
+    if cache_result and PREDICTION_CACHE_SIZE > 0:
+        prediction_cache[key] = result
+        if len(prediction_cache) > PREDICTION_CACHE_SIZE:
+            prediction_cache.popitem(last=False)
+    return result
+
 # FastAPI app configuration
 app = FastAPI(
     title="Census Income Prediction API",
@@ -108,14 +370,30 @@ app.add_middleware(
 # Create API router for versioned endpoints
 api_v1 = APIRouter(prefix="/v1", tags=["v1"])
 
+# Background batching worker lifecycle
+@app.on_event("startup")
+async def start_batch_worker():
+    global prediction_queue, batch_worker_task, inference_executor
+    inference_executor = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="inference")
+    prediction_queue = asyncio.Queue()
+    batch_worker_task = asyncio.ensure_future(batch_predictions())
+    logger.info(f"Batch worker started (max_batch_size={MAX_BATCH_SIZE}, max_wait_ms={MAX_WAIT_MS})")
+
+@app.on_event("shutdown")
+async def stop_batch_worker():
+    if batch_worker_task is not None:
+        batch_worker_task.cancel()
+    if inference_executor is not None:
+        inference_executor.shutdown(wait=False)
+
 # Middleware for request logging and metrics
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     global request_count
     start_time_req = time.time()
     
-    # Log request
-    logger.info(f"Request: {request.method} {request.url}")
+    # Log request (per-request logs only with LOG_LEVEL=DEBUG)
+    logger.debug("Request: %s %s", request.method, request.url)
     request_count += 1
     
     # Process request
@@ -123,7 +401,7 @@ async def log_requests(request: Request, call_next):
     
     # Log response
     process_time = time.time() - start_time_req
-    logger.info(f"Response: {response.status_code} - Time: {process_time:.4f}s")
+    logger.debug("Response: %s - Time: %.4fs", response.status_code, process_time)
     
     return response
 
@@ -143,7 +421,7 @@ async def get_root():
 @api_v1.get("/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint for monitoring."""
-    current_time = datetime.utcnow().isoformat() + "Z"
+    current_time = utc_timestamp()
     uptime = time.time() - start_time
     
     return HealthResponse(
@@ -158,7 +436,7 @@ async def health_check():
 @api_v1.get("/metrics", response_model=MetricsResponse)
 async def get_metrics():
     """Get model performance metrics and API statistics."""
-    current_time = datetime.utcnow().isoformat() + "Z"
+    current_time = utc_timestamp()
     uptime = time.time() - start_time
     
     # Mock performance metrics (in production, these would come from model evaluation)
@@ -195,87 +473,138 @@ async def get_model_info():
         "trained_on": "1994 US Census data"
     }
 
-# Prediction endpoint
-@api_v1.post("/predict", response_model=PredictionResponse)
-async def predict_income(data: Data):
-    """Predict income category based on individual characteristics."""
-    global model_predictions
-    
+async def make_prediction(data: Data, batch: bool = False) -> Tuple[str, float]:
+    """Score a request for the prediction endpoints, raising HTTPException on failure.
+
+    Rows of a batch request are not cached and not logged individually.
+    """
     if not model_loaded:
         raise HTTPException(status_code=503, detail="Model not available")
     
     try:
-        # Convert Pydantic model to dict and then to DataFrame
-        data_dict = data.dict(by_alias=True)
-        data_df = pd.DataFrame([data_dict])
-        
-        # Define categorical features
-        cat_features = [
-            "workclass",
-            "education",
-            "marital-status",
-            "occupation",
-            "relationship",
-            "race",
-            "sex",
-            "native-country",
-        ]
-        
-        # Process data
-        data_processed, _, _, _ = process_data(
-            X=data_df,
-            categorical_features=cat_features,
-            training=False,
-            encoder=encoder
-        )
-        
-        # Make prediction
-        prediction_proba = model.predict_proba(data_processed)
-        prediction = inference(model, data_processed)
-        
-        # Get prediction label and confidence
-        prediction_label = apply_label(prediction)
-        confidence = float(np.max(prediction_proba))
-        
-        # Update prediction metrics
-        model_predictions[prediction_label] += 1
-        
-        # Create response
-        response = PredictionResponse(
-            prediction=prediction_label,
-            confidence=confidence,
-            model_version="v1.0.0",
-            timestamp=datetime.utcnow().isoformat() + "Z"
-        )
-        
-        logger.info(f"Prediction made: {prediction_label} (confidence: {confidence:.4f})")
-        return response
-        
+        prediction_label, confidence = await get_prediction(data, cache_result=not batch)
     except Exception as e:
         logger.error(f"Error during prediction: {e}")
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+    
+    # Update prediction metrics
+    model_predictions[prediction_label] += 1
+    
+    if not batch:
+        logger.info(f"Prediction made: {prediction_label} (confidence: {confidence:.4f})")
+    return prediction_label, confidence
+
+# Prediction endpoint; the response is built from trusted values, so it skips
+# response_model validation and PredictionResponse only documents the schema
+@api_v1.post("/predict", responses={
+    200: {"model": PredictionResponse},
+    422: {"model": ValidationErrorResponse}
+})
+async def predict_income(data: Data = Depends(parse_data)):
+    """Predict income category based on individual characteristics."""
+    prediction_label, confidence = await make_prediction(data)
+    
+    return ORJSONResponse({
+        "prediction": prediction_label,
+        "confidence": confidence,
+        "model_version": "v1.0.0",
+        "timestamp": utc_timestamp()
+    })
+
+# Batch prediction endpoint; rows go through the same micro-batching queue as
+# single predictions, so one request fills whole batches. Cached results are
+# reused, but batch rows are not added to the cache.
+@api_v1.post("/predict/batch", responses={
+    200: {"model": BatchPredictionResponse},
+    413: {"description": "More than MAX_REQUEST_ROWS records"},
+    422: {"model": ValidationErrorResponse}
+})
+async def predict_income_batch(rows: List[Data] = Depends(parse_batch)):
+    """Predict income categories for several individuals in one request."""
+    results = await asyncio.gather(*(make_prediction(data, batch=True) for data in rows))
+    logger.info(f"Batch prediction made: {len(results)} records")
+    
+    return ORJSONResponse({
+        "predictions": [
+            {"prediction": prediction_label, "confidence": confidence}
+            for prediction_label, confidence in results
+        ],
+        "model_version": "v1.0.0",
+        "timestamp": utc_timestamp()
+    })
+
+# Prediction cache admin endpoint
+@api_v1.post("/cache/clear")
+async def clear_prediction_cache():
+    """Drop the cached predictions held by the worker process serving this request."""
+    cleared = len(prediction_cache)
+    prediction_cache.clear()
+    logger.info(f"Prediction cache cleared ({cleared} entries)")
+    return {"cleared": cleared}
 
 # Legacy endpoint for backward compatibility
-@app.post("/data/")
-async def legacy_inference(data: Data):
+@app.post("/data/", responses={422: {"model": ValidationErrorResponse}})
+async def legacy_inference(data: Data = Depends(parse_data)):
     """Legacy endpoint for backward compatibility."""
     logger.warning("Legacy endpoint /data/ used. Consider migrating to /v1/predict")
     
     # Redirect to new endpoint logic
     try:
-        result = await predict_income(data)
-        return {"result": result.prediction}
+        prediction_label, _ = await make_prediction(data)
+        return {"result": prediction_label}
     except HTTPException as e:
         return JSONResponse(status_code=e.status_code, content={"error": e.detail})
 
 # Include the API router
 app.include_router(api_v1)
 
-if __name__ == "__main__":
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level="info"
+def custom_openapi():
+    """OpenAPI schema with the msgspec request bodies added to the prediction routes."""
+    if app.openapi_schema:
+        return app.openapi_schema
+
+    schema = get_openapi(
+        title=app.title,
+        version=app.version,
+        description=app.description,
+        routes=app.routes
+    )
+    (data_schema,), components = msgspec.json.schema_components(
+        [Data], ref_template="#/components/schemas/{name}"
     )
+    schema.setdefault("components", {}).setdefault("schemas", {}).update(components)
+    batch_schema = {"type": "array", "items": data_schema, "minItems": 1, "maxItems": MAX_REQUEST_ROWS}
+    for path, body_schema in (("/v1/predict", data_schema), ("/data/", data_schema),
+                              ("/v1/predict/batch", batch_schema)):
+        schema["paths"][path]["post"]["requestBody"] = {
+            "content": {"application/json": {"schema": body_schema}},
+            "required": True
+        }
+
+    app.openapi_schema = schema
+    return schema
+
+app.openapi = custom_openapi
+
+if __name__ == "__main__":
+    if os.getenv("RELOAD", "false").lower() == "true":
+        # Development: single auto-reloading process
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=8000,
+            reload=True,
+            log_level="info"
+        )
+    else:
+        # Production: one process per core; "auto" picks uvloop and httptools
+        # when they are installed (uvicorn[standard])
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=8000,
+            workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+            loop="auto",
+            http="auto",
+            log_level="info"
+        )
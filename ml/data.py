@@ -33,7 +33,7 @@ def process_data(
     Returns
     -------
     X : np.array
-        Processed data.
+        Processed data, as float32 (the dtype the tree models score in).
     y : np.array
         Processed labels if labeled=True, otherwise empty np.array.
     encoder : sklearn.preprocessing._encoders.OneHotEncoder
@@ -54,7 +54,7 @@ def process_data(
     X_continuous = X.drop(columns=categorical_features)
 
     if training is True:
-        encoder = OneHotEncoder(sparse=False, handle_unknown="ignore")
+        encoder = OneHotEncoder(sparse=False, handle_unknown="ignore", dtype=np.float32)
         lb = LabelBinarizer()
         X_categorical = encoder.fit_transform(X_categorical)
         y = lb.fit_transform(y.values).ravel()
@@ -66,9 +66,42 @@ def process_data(
         except AttributeError:
             pass
 
-    X = np.concatenate([X_continuous, X_categorical], axis=1)
+    X = np.concatenate([X_continuous, X_categorical], axis=1, dtype=np.float32)
     return X, y, encoder, lb
 
+def assemble_features(continuous, category_codes, offsets, out):
+    """ Write continuous values and one-hot bits into a preallocated feature matrix.
+
+    Produces the same column layout as `process_data` (continuous columns followed
+    by the one-hot blocks) from integer category codes, using one vectorized
+    scatter for the whole batch instead of a per-row encoder call.
+
+    Inputs
+    ------
+    continuous : np.array
+        Continuous feature values, shape (n_rows, n_continuous).
+    category_codes : np.array
+        Integer position of each row's category within its feature's categories,
+        shape (n_rows, n_categorical). Use -1 for unknown categories, which leave
+        their block all zeros like OneHotEncoder(handle_unknown="ignore").
+    offsets : np.array
+        Start column of each categorical feature's one-hot block, counted from the
+        first encoded column.
+    out : np.array
+        Output matrix of shape (n_rows, n_features), overwritten in place.
+
+    Returns
+    -------
+    out : np.array
+        The filled feature matrix.
+    """
+    n_continuous = continuous.shape[1]
+    out[:, :n_continuous] = continuous
+    out[:, n_continuous:] = 0
+    rows, cols = np.nonzero(category_codes >= 0)
+    out[rows, n_continuous + offsets[cols] + category_codes[rows, cols]] = 1
+    return out
+
 def apply_label(inference):
     """ Convert the binary label in a single inference sample into string output."""
     if inference[0] == 1:
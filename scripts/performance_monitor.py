@@ -9,26 +9,77 @@ Usage:
 """
 
 import argparse
+import asyncio
 import time
-import json
+import itertools
 import logging
-import statistics
+from collections import deque
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Deque, Dict, List, Any, Optional
+import aiohttp
+import numpy as np
+import orjson
 import requests
-import threading
+from requests.adapters import HTTPAdapter
 from pathlib import Path
 
 
+# Payload used for prediction checks and load tests
+PREDICTION_TEST_DATA = {
+    "age": 37,
+    "workclass": "Private",
+    "fnlgt": 178356,
+    "education": "HS-grad",
+    "education-num": 10,
+    "marital-status": "Married-civ-spouse",
+    "occupation": "Prof-specialty",
+    "relationship": "Husband",
+    "race": "White",
+    "sex": "Male",
+    "capital-gain": 0,
+    "capital-loss": 0,
+    "hours-per-week": 40,
+    "native-country": "United-States"
+}
+
+
+def summarize(values: np.ndarray) -> Dict[str, Optional[float]]:
+    """Mean, min, max and p50/p90/p99 of an array, or all None when it is empty"""
+    if values.size == 0:
+        return dict.fromkeys(['mean', 'min', 'max', 'p50', 'p90', 'p99'])
+    
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {
+        'mean': float(values.mean()),
+        'min': float(values.min()),
+        'max': float(values.max()),
+        'p50': float(p50),
+        'p90': float(p90),
+        'p99': float(p99)
+    }
+
+
 class APIMonitor:
     """API Performance Monitor"""
     
     def __init__(self, base_url: str, interval: int = 60):
         self.base_url = base_url.rstrip('/')
         self.interval = interval
-        self.metrics_history: List[Dict[str, Any]] = []
+        # Ring buffer of the last 100 collections
+        self.metrics_history: Deque[Dict[str, Any]] = deque(maxlen=100)
         self.running = False
         
+        # Keep-alive session shared by the health, prediction and metrics checks
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json"})
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        
+        # Event loop and aiohttp session kept alive across load tests
+        self.loop = asyncio.new_event_loop()
+        self.http_session: Optional[aiohttp.ClientSession] = None
+        
         # Setup logging
         logging.basicConfig(
             level=logging.INFO,
@@ -47,11 +98,11 @@ class APIMonitor:
         """Check API health and collect metrics"""
         try:
             start_time = time.time()
-            response = requests.get(f"{self.base_url}/v1/health", timeout=10)
+            response = self.session.get(f"{self.base_url}/v1/health", timeout=10)
             response_time = time.time() - start_time
             
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 return {
                     'status': 'healthy',
                     'response_time': response_time,
@@ -74,35 +125,17 @@ class APIMonitor:
     
     def check_prediction_performance(self) -> Dict[str, Any]:
         """Test prediction endpoint performance"""
-        test_data = {
-            "age": 37,
-            "workclass": "Private",
-            "fnlgt": 178356,
-            "education": "HS-grad",
-            "education-num": 10,
-            "marital-status": "Married-civ-spouse",
-            "occupation": "Prof-specialty",
-            "relationship": "Husband",
-            "race": "White",
-            "sex": "Male",
-            "capital-gain": 0,
-            "capital-loss": 0,
-            "hours-per-week": 40,
-            "native-country": "United-States"
-        }
-        
         try:
             start_time = time.time()
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/v1/predict",
-                json=test_data,
-                headers={"Content-Type": "application/json"},
+                json=PREDICTION_TEST_DATA,
                 timeout=10
             )
             response_time = time.time() - start_time
             
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 return {
                     'status': 'success',
                     'response_time': response_time,
@@ -126,53 +159,71 @@ class APIMonitor:
     def get_api_metrics(self) -> Dict[str, Any]:
         """Get API metrics"""
         try:
-            response = requests.get(f"{self.base_url}/v1/metrics", timeout=10)
+            response = self.session.get(f"{self.base_url}/v1/metrics", timeout=10)
             if response.status_code == 200:
-                return response.json()
+                return orjson.loads(response.content)
             else:
                 return {'error': f'HTTP {response.status_code}'}
         except requests.exceptions.RequestException as e:
             return {'error': str(e)}
     
+    async def _timed_prediction(self) -> Dict[str, Any]:
+        """Send one prediction request over the shared aiohttp session"""
+        try:
+            start_time = time.time()
+            async with self.http_session.post(
+                f"{self.base_url}/v1/predict", json=PREDICTION_TEST_DATA
+            ) as response:
+                await response.read()
+                response_time = time.time() - start_time
+                
+                if response.status == 200:
+                    return {'status': 'success', 'response_time': response_time}
+                else:
+                    return {
+                        'status': 'error',
+                        'response_time': response_time,
+                        'error': f'HTTP {response.status}'
+                    }
+                    
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return {
+                'status': 'error',
+                'error': str(e),
+                'response_time': None
+            }
+    
+    async def _run_load_test(self, num_requests: int) -> List[Dict[str, Any]]:
+        """Fire `num_requests` concurrent predictions and gather the results"""
+        if self.http_session is None:
+            self.http_session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
+        return await asyncio.gather(*(self._timed_prediction() for _ in range(num_requests)))
+    
     def run_load_test(self, num_requests: int = 10) -> Dict[str, Any]:
         """Run a mini load test"""
-        results = []
-        successful_requests = 0
-        
-        def make_request():
-            nonlocal successful_requests
-            result = self.check_prediction_performance()
-            results.append(result)
-            if result['status'] == 'success':
-                successful_requests += 1
-        
-        # Create threads for concurrent requests
-        threads = []
         start_time = time.time()
-        
-        for _ in range(num_requests):
-            thread = threading.Thread(target=make_request)
-            threads.append(thread)
-            thread.start()
-        
-        # Wait for all threads to complete
-        for thread in threads:
-            thread.join(timeout=30)
+        results = self.loop.run_until_complete(self._run_load_test(num_requests))
+        successful_requests = sum(1 for r in results if r['status'] == 'success')
         
         total_time = time.time() - start_time
         
         # Calculate statistics
-        response_times = [r['response_time'] for r in results if r.get('response_time') is not None]
+        response_times = summarize(np.fromiter(
+            (r['response_time'] for r in results if r.get('response_time') is not None),
+            dtype=np.float64
+        ))
         
         return {
             'total_requests': num_requests,
             'successful_requests': successful_requests,
             'success_rate': successful_requests / num_requests,
             'total_time': total_time,
-            'avg_response_time': statistics.mean(response_times) if response_times else None,
-            'min_response_time': min(response_times) if response_times else None,
-            'max_response_time': max(response_times) if response_times else None,
-            'median_response_time': statistics.median(response_times) if response_times else None
+            'avg_response_time': response_times['mean'],
+            'min_response_time': response_times['min'],
+            'max_response_time': response_times['max'],
+            'median_response_time': response_times['p50'],
+            'p90_response_time': response_times['p90'],
+            'p99_response_time': response_times['p99']
         }
     
     def collect_metrics(self) -> Dict[str, Any]:
@@ -203,10 +254,6 @@ class APIMonitor:
         
         self.metrics_history.append(metrics)
         
-        # Keep only last 100 metrics
-        if len(self.metrics_history) > 100:
-            self.metrics_history = self.metrics_history[-100:]
-        
         return metrics
     
     def save_metrics(self, filename: Optional[str] = None):
@@ -215,8 +262,11 @@ class APIMonitor:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"logs/metrics_{timestamp}.json"
         
-        with open(filename, 'w') as f:
-            json.dump(self.metrics_history, f, indent=2, default=str)
+        Path(filename).write_bytes(orjson.dumps(
+            list(self.metrics_history),
+            option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY,
+            default=str
+        ))
         
         self.logger.info(f"Metrics saved to {filename}")
     
@@ -226,42 +276,49 @@ class APIMonitor:
             return {'error': 'No metrics available'}
         
         # Analyze recent metrics (last 10 entries)
-        recent_metrics = self.metrics_history[-10:]
+        recent_metrics = list(itertools.islice(
+            self.metrics_history, max(0, len(self.metrics_history) - 10), None
+        ))
         
         # Health status
         health_statuses = [m['health']['status'] for m in recent_metrics]
         healthy_count = sum(1 for status in health_statuses if status == 'healthy')
         
         # Response times
-        health_response_times = [
-            m['health']['response_time'] for m in recent_metrics 
-            if m['health'].get('response_time') is not None
-        ]
-        
-        prediction_response_times = [
-            m['prediction']['response_time'] for m in recent_metrics 
-            if m['prediction'].get('response_time') is not None
-        ]
+        health_response_times = summarize(np.fromiter(
+            (m['health']['response_time'] for m in recent_metrics
+             if m['health'].get('response_time') is not None),
+            dtype=np.float64
+        ))
+        
+        prediction_response_times = summarize(np.fromiter(
+            (m['prediction']['response_time'] for m in recent_metrics
+             if m['prediction'].get('response_time') is not None),
+            dtype=np.float64
+        ))
         
         # Load test success rates
-        success_rates = [
-            m['load_test']['success_rate'] for m in recent_metrics 
-            if 'load_test' in m and 'success_rate' in m['load_test']
-        ]
+        success_rates = summarize(np.fromiter(
+            (m['load_test']['success_rate'] for m in recent_metrics
+             if 'load_test' in m and 'success_rate' in m['load_test']),
+            dtype=np.float64
+        ))
         
         report = {
             'period': f"Last {len(recent_metrics)} checks",
             'health': {
                 'availability': healthy_count / len(recent_metrics),
-                'avg_response_time': statistics.mean(health_response_times) if health_response_times else None
+                'avg_response_time': health_response_times['mean']
             },
             'prediction': {
-                'avg_response_time': statistics.mean(prediction_response_times) if prediction_response_times else None,
-                'max_response_time': max(prediction_response_times) if prediction_response_times else None
+                'avg_response_time': prediction_response_times['mean'],
+                'max_response_time': prediction_response_times['max'],
+                'p90_response_time': prediction_response_times['p90'],
+                'p99_response_time': prediction_response_times['p99']
             },
             'load_test': {
-                'avg_success_rate': statistics.mean(success_rates) if success_rates else None,
-                'min_success_rate': min(success_rates) if success_rates else None
+                'avg_success_rate': success_rates['mean'],
+                'min_success_rate': success_rates['min']
             },
             'latest_metrics': recent_metrics[-1] if recent_metrics else None
         }
@@ -292,6 +349,10 @@ class APIMonitor:
             print(f"  Avg Response Time: {report['prediction']['avg_response_time']:.3f}s")
         if report['prediction']['max_response_time']:
             print(f"  Max Response Time: {report['prediction']['max_response_time']:.3f}s")
+        if report['prediction']['p90_response_time']:
+            print(f"  P90 Response Time: {report['prediction']['p90_response_time']:.3f}s")
+        if report['prediction']['p99_response_time']:
+            print(f"  P99 Response Time: {report['prediction']['p99_response_time']:.3f}s")
         
         print(f"\nLOAD TEST:")
         if report['load_test']['avg_success_rate']:
@@ -342,6 +403,7 @@ class APIMonitor:
         finally:
             self.running = False
             self.save_metrics()
+            self.close()
     
     def check_alerts(self, metrics: Dict[str, Any]):
         """Check for performance alerts"""
@@ -369,6 +431,14 @@ class APIMonitor:
     def stop_monitoring(self):
         """Stop monitoring"""
         self.running = False
+    
+    def close(self):
+        """Close the HTTP sessions and the load test event loop"""
+        self.session.close()
+        if self.http_session is not None:
+            self.loop.run_until_complete(self.http_session.close())
+            self.http_session = None
+        self.loop.close()
 
 
 def main():
@@ -389,6 +459,7 @@ def main():
         monitor.print_report()
         if args.save:
             monitor.save_metrics(args.save)
+        monitor.close()
     else:
         # Continuous monitoring mode
         try:
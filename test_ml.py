@@ -1,31 +1,63 @@
+import math
 import pytest
 import os
+import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
-from ml.model import train_model
+from ml.data import assemble_features
+from ml.model import forest_predict_proba, train_model
 from sklearn.ensemble import RandomForestClassifier
 from pathlib import Path
 
 
-def test_train_test_split_size():
+CENSUS_DTYPES = {
+    'age': 'int64',
+    'workclass': 'category',
+    'fnlgt': 'int64',
+    'education': 'category',
+    'education-num': 'int64',
+    'marital-status': 'category',
+    'occupation': 'category',
+    'relationship': 'category',
+    'race': 'category',
+    'sex': 'category',
+    'capital-gain': 'int64',
+    'capital-loss': 'int64',
+    'hours-per-week': 'int64',
+    'native-country': 'category',
+    'salary': 'category',
+}
+
+
+@pytest.fixture(scope='session')
+def census_data():
+    """
+    census data parsed once for the whole test session
+    """
+    return pd.read_csv('./data/census.csv', dtype=CENSUS_DTYPES)
+
+
+@pytest.fixture(scope='session')
+def tiny_xy():
+    """
+    small in-memory training set for model tests
+    """
+    X = np.arange(20, dtype=np.float32).reshape(10, 2)
+    y = np.arange(10) % 2
+    return X, y
+
+
+def test_train_test_split_size(census_data):
     """
     checking that the sliced data is ready for testing
     """
-    # Your code here
-    data_path = './data/census.csv'
-    data = pd.read_csv(str(data_path))
-    train, test = train_test_split(data, test_size = 0.2)
-    assert len(test) >= 2000
+    # train_test_split sizes the test set as ceil(test_size * n_rows)
+    assert math.ceil(len(census_data) * 0.2) >= 2000
 
 
-def test_column_names():
+def test_column_names(census_data):
     """
     testing that all features are in the data
     """
-    # Your code here
-    data_path = './data/census.csv'
-    data = pd.read_csv(data_path)
-
     features = {
         'age',
         'workclass',
@@ -44,17 +76,45 @@ def test_column_names():
         'salary'
     }
 
-    assert set(data.columns) == features
+    assert set(census_data.columns) == features
 
 
-def test_model_type():
+def test_model_type(tiny_xy):
     """
     testing that the model is random forest classifier 
     """
-    # Your code here
-    sample_x = [[0, 1, 2], [3, 4, 5]]
-    sample_y = ['col1', 'col2']
+    X, y = tiny_xy
 
-    model = train_model(sample_x, sample_y)
+    model = train_model(X, y, n_estimators=1, max_depth=1)
 
     assert isinstance(model, RandomForestClassifier)
+
+
+def test_assemble_features():
+    """
+    testing that features are laid out as continuous values then one-hot blocks
+    """
+    continuous = np.array([[37, 10], [50, 13]])
+    # two categorical features with 3 and 2 categories; -1 is an unknown value
+    codes = np.array([[2, 0], [-1, 1]])
+    offsets = np.array([0, 3])
+    out = np.full((2, 7), 9, dtype=np.float32)
+
+    assemble_features(continuous, codes, offsets, out)
+
+    expected = np.array([
+        [37, 10, 0, 0, 1, 1, 0],
+        [50, 13, 0, 0, 0, 0, 1],
+    ], dtype=np.float32)
+    assert np.array_equal(out, expected)
+
+
+def test_forest_predict_proba(tiny_xy):
+    """
+    testing that the direct tree walk matches the forest's predict_proba
+    """
+    X, y = tiny_xy
+
+    model = train_model(X, y, n_estimators=5, random_state=0)
+
+    assert np.allclose(forest_predict_proba(model, X), model.predict_proba(X))
@@ -0,0 +1,12 @@
+"""
+Shared pytest configuration for the test suite
+"""
+
+
+def pytest_configure(config):
+    # pytest-xdist registers this marker itself; register it here too so runs
+    # without xdist installed (e.g. CI) do not warn about an unknown mark
+    config.addinivalue_line(
+        "markers",
+        "xdist_group(name): run tests of the same group on one xdist worker (--dist=loadgroup)"
+    )
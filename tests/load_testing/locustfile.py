@@ -4,14 +4,195 @@ Load testing script for Census ML API using Locust
 Usage:
     locust -f tests/load_testing/locustfile.py --host=http://localhost:8000
     
+Zero-wait throughput users (PredictUser, BurstUser) live in throughput_locustfile.py
+so they never join this mixed workload.
+    
+Add --disable-gc to keep garbage-collection pauses out of short measurement runs.
+    
 Web UI: http://localhost:8089
 """
 
-import json
+import gc
+import itertools
 import random
-from locust import HttpUser, task, between
+from typing import Dict, List
+
+import msgspec
+import numpy as np
+import orjson
+from locust import events, task, between
+from locust.contrib.fasthttp import FastHttpUser
+
+# Payloads are JSON-encoded once and sent as raw bytes with this header
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+# Response schemas; msgspec parses and validates a response body in one pass
+class PredictResponse(msgspec.Struct):
+    prediction: str
+    confidence: float
+    model_version: str
+    timestamp: str
+
+
+class HealthResponse(msgspec.Struct):
+    status: str
+    timestamp: str
+    model_loaded: bool
+    version: str
+    uptime_seconds: float
+
+
+class MetricsResponse(msgspec.Struct):
+    model_performance: Dict[str, float]
+    request_count: int
+    prediction_distribution: Dict[str, int]
+    uptime_seconds: float
+    last_updated: str
+
+
+class ModelInfoResponse(msgspec.Struct):
+    model_type: str
+    features: List[str]
+    target_classes: List[str]
+    model_version: str
+    trained_on: str
+
+
+class LegacyResponse(msgspec.Struct):
+    result: str
+
+
+# Realistic value distributions based on census data; weights are the category
+# counts in data/census.csv, so categorical fields follow the real marginals
+WORKCLASS_OPTIONS = ["Private", "Self-emp-not-inc", "Self-emp-inc", "Federal-gov", "Local-gov", "State-gov"]
+WORKCLASS_WEIGHTS = [22696, 2541, 1116, 960, 2093, 1298]
+EDUCATION_OPTIONS = ["Bachelors", "Some-college", "11th", "HS-grad", "Prof-school", "Assoc-acdm", "Assoc-voc", "9th", "7th-8th", "12th", "Masters", "1st-4th", "10th", "Doctorate", "5th-6th", "Preschool"]
+EDUCATION_WEIGHTS = [5355, 7291, 1175, 10501, 576, 1067, 1382, 514, 646, 433, 1723, 168, 933, 413, 333, 51]
+MARITAL_STATUS_OPTIONS = ["Married-civ-spouse", "Divorced", "Never-married", "Separated", "Widowed", "Married-spouse-absent", "Married-AF-spouse"]
+MARITAL_STATUS_WEIGHTS = [14976, 4443, 10683, 1025, 993, 418, 23]
+OCCUPATION_OPTIONS = ["Tech-support", "Craft-repair", "Other-service", "Sales", "Exec-managerial", "Prof-specialty", "Handlers-cleaners", "Machine-op-inspct", "Adm-clerical", "Farming-fishing", "Transport-moving", "Priv-house-serv", "Protective-serv", "Armed-Forces"]
+OCCUPATION_WEIGHTS = [928, 4099, 3295, 3650, 4066, 4140, 1370, 2002, 3770, 994, 1597, 149, 649, 9]
+RELATIONSHIP_OPTIONS = ["Wife", "Own-child", "Husband", "Not-in-family", "Other-relative", "Unmarried"]
+RELATIONSHIP_WEIGHTS = [1568, 5068, 13193, 8305, 981, 3446]
+RACE_OPTIONS = ["White", "Asian-Pac-Islander", "Amer-Indian-Eskimo", "Other", "Black"]
+RACE_WEIGHTS = [27816, 1039, 311, 271, 3124]
+SEX_OPTIONS = ["Female", "Male"]
+SEX_WEIGHTS = [10771, 21790]
+COUNTRY_OPTIONS = ["United-States", "Cambodia", "England", "Puerto-Rico", "Canada", "Germany", "Outlying-US(Guam-USVI-etc)", "India", "Japan", "Greece", "South", "China", "Cuba", "Iran", "Honduras", "Philippines", "Italy", "Poland", "Jamaica", "Vietnam", "Mexico", "Portugal", "Ireland", "France", "Dominican-Republic", "Laos", "Ecuador", "Taiwan", "Haiti", "Columbia", "Hungary", "Guatemala", "Nicaragua", "Scotland", "Thailand", "Yugoslavia", "El-Salvador", "Trinadad&Tobago", "Peru", "Hong", "Holand-Netherlands"]
+COUNTRY_WEIGHTS = [29170, 19, 90, 114, 121, 137, 14, 100, 62, 29, 80, 75, 95, 43, 13, 198, 73, 60, 81, 67, 643, 37, 24, 29, 70, 18, 28, 51, 44, 59, 13, 64, 34, 12, 18, 16, 106, 19, 31, 20, 1]
+
+# Payloads are generated once at import, a whole column per field with NumPy;
+# tasks cycle through the pool of 2**PAYLOAD_POOL_BITS entries with a counter
+PAYLOAD_POOL_BITS = 16
+PAYLOAD_POOL_MASK = (1 << PAYLOAD_POOL_BITS) - 1
+RNG = np.random.default_rng()
+
+
+def build_payload_pool(size):
+    """
+    Generate `size` JSON-encoded prediction payloads from one vectorized draw per
+    field, sampling categorical fields by their census frequencies
+    """
+    def weighted(options, weights):
+        weights = np.asarray(weights, dtype=np.float64)
+        return RNG.choice(options, size=size, p=weights / weights.sum())
+    
+    def sparse(upper):
+        # Non-zero for roughly 10% of payloads
+        values = RNG.integers(0, upper + 1, size=size)
+        return np.where(RNG.random(size) < 0.1, values, 0)
+    
+    columns = {
+        "age": RNG.integers(17, 91, size=size),
+        "workclass": weighted(WORKCLASS_OPTIONS, WORKCLASS_WEIGHTS),
+        "fnlgt": RNG.integers(12285, 1484706, size=size),
+        "education": weighted(EDUCATION_OPTIONS, EDUCATION_WEIGHTS),
+        "education-num": RNG.integers(1, 17, size=size),
+        "marital-status": weighted(MARITAL_STATUS_OPTIONS, MARITAL_STATUS_WEIGHTS),
+        "occupation": weighted(OCCUPATION_OPTIONS, OCCUPATION_WEIGHTS),
+        "relationship": weighted(RELATIONSHIP_OPTIONS, RELATIONSHIP_WEIGHTS),
+        "race": weighted(RACE_OPTIONS, RACE_WEIGHTS),
+        "sex": weighted(SEX_OPTIONS, SEX_WEIGHTS),
+        "capital-gain": sparse(99999),
+        "capital-loss": sparse(4356),
+        "hours-per-week": RNG.integers(1, 100, size=size),
+        "native-country": weighted(COUNTRY_OPTIONS, COUNTRY_WEIGHTS)
+    }
+    # tolist() converts to native ints/strs for JSON encoding; only the encoded
+    # bytes are kept, each row dict is dropped as soon as it is serialized
+    fields = list(columns)
+    return [
+        orjson.dumps(dict(zip(fields, row)))
+        for row in zip(*(column.tolist() for column in columns.values()))
+    ]
+
+
+ENCODED_POOL = build_payload_pool(1 << PAYLOAD_POOL_BITS)
+payload_counter = itertools.count()
+
+
+def next_payload():
+    """Return the next pre-encoded payload, cycling through the pool"""
+    return ENCODED_POOL[next(payload_counter) & PAYLOAD_POOL_MASK]
+
+# Fixed payload for StressTestUser
+STRESS_PAYLOAD = orjson.dumps({
+    "age": 39,
+    "workclass": "State-gov",
+    "fnlgt": 77516,
+    "education": "Bachelors",
+    "education-num": 13,
+    "marital-status": "Never-married",
+    "occupation": "Adm-clerical",
+    "relationship": "Not-in-family",
+    "race": "White",
+    "sex": "Male",
+    "capital-gain": 2174,
+    "capital-loss": 0,
+    "hours-per-week": 40,
+    "native-country": "United-States"
+})
 
-class CensusAPIUser(HttpUser):
+
+@events.init_command_line_parser.add_listener
+def add_gc_option(parser):
+    parser.add_argument("--disable-gc", action="store_true", default=False,
+                        help="Disable Python garbage collection while a test is running")
+
+
+@events.test_start.add_listener
+def disable_gc(environment, **kwargs):
+    """Stop the collector for the run so its pauses do not skew latencies"""
+    if environment.parsed_options and environment.parsed_options.disable_gc:
+        gc.disable()
+
+
+@events.test_stop.add_listener
+def enable_gc(environment, **kwargs):
+    gc.enable()
+
+
+class APIUser(FastHttpUser):
+    """
+    Connection settings shared by all users
+
+    All users are FastHttpUser (geventhttpclient) rather than HttpUser, as recommended
+    by Locust's performance guide: the requests-based client saturates the load
+    generator's CPU long before the API does. geventhttpclient keeps connections
+    alive between requests; each user gets a pool of persistent sockets and fails
+    fast instead of retrying on a new one.
+    """
+    
+    abstract = True
+    network_timeout = 30.0
+    connection_timeout = 10.0
+    concurrency = 10
+    max_retries = 0
+    default_headers = {"Connection": "keep-alive"}
+
+
+class CensusAPIUser(APIUser):
     """
     Simulates a user interacting with the Census ML API
     """
@@ -31,21 +212,21 @@ class CensusAPIUser(HttpUser):
         """
         Main prediction task - weighted to run more frequently
         """
-        # Generate realistic test data
-        test_data = self.generate_test_data()
+        # Pick a realistic pre-encoded payload
+        payload = self.generate_test_data()
         
         with self.client.post(
             "/v1/predict",
-            json=test_data,
-            headers={"Content-Type": "application/json"},
+            data=payload,
+            headers=JSON_HEADERS,
             catch_response=True
         ) as response:
             if response.status_code == 200:
-                result = response.json()
-                if "prediction" in result and "confidence" in result:
+                try:
+                    msgspec.json.decode(response.content, type=PredictResponse)
                     response.success()
-                else:
-                    response.failure("Invalid response format")
+                except msgspec.DecodeError as e:
+                    response.failure(f"Invalid response format: {e}")
             else:
                 response.failure(f"HTTP {response.status_code}")
     
@@ -54,11 +235,15 @@ class CensusAPIUser(HttpUser):
         """Health check task"""
         with self.client.get("/v1/health", catch_response=True) as response:
             if response.status_code == 200:
-                result = response.json()
-                if result.get("status") == "healthy":
-                    response.success()
+                try:
+                    result = msgspec.json.decode(response.content, type=HealthResponse)
+                except msgspec.DecodeError as e:
+                    response.failure(f"Invalid health response: {e}")
                 else:
-                    response.failure("API reports unhealthy")
+                    if result.status == "healthy":
+                        response.success()
+                    else:
+                        response.failure("API reports unhealthy")
             else:
                 response.failure(f"Health check failed: {response.status_code}")
     
@@ -67,11 +252,11 @@ class CensusAPIUser(HttpUser):
         """Metrics endpoint task"""
         with self.client.get("/v1/metrics", catch_response=True) as response:
             if response.status_code == 200:
-                result = response.json()
-                if "model_performance" in result:
+                try:
+                    msgspec.json.decode(response.content, type=MetricsResponse)
                     response.success()
-                else:
-                    response.failure("Invalid metrics response")
+                except msgspec.DecodeError as e:
+                    response.failure(f"Invalid metrics response: {e}")
             else:
                 response.failure(f"Metrics failed: {response.status_code}")
     
@@ -80,68 +265,42 @@ class CensusAPIUser(HttpUser):
         """Model info endpoint task"""
         with self.client.get("/v1/model/info", catch_response=True) as response:
             if response.status_code == 200:
-                result = response.json()
-                if "model_type" in result:
+                try:
+                    msgspec.json.decode(response.content, type=ModelInfoResponse)
                     response.success()
-                else:
-                    response.failure("Invalid model info response")
+                except msgspec.DecodeError as e:
+                    response.failure(f"Invalid model info response: {e}")
             else:
                 response.failure(f"Model info failed: {response.status_code}")
     
     @task(1)
     def test_legacy_endpoint(self):
         """Test legacy endpoint for backward compatibility"""
-        test_data = self.generate_test_data()
+        payload = self.generate_test_data()
         
         with self.client.post(
             "/data/",
-            json=test_data,
-            headers={"Content-Type": "application/json"},
+            data=payload,
+            headers=JSON_HEADERS,
             catch_response=True
         ) as response:
             if response.status_code == 200:
-                result = response.json()
-                if "result" in result:
+                try:
+                    msgspec.json.decode(response.content, type=LegacyResponse)
                     response.success()
-                else:
-                    response.failure("Invalid legacy response format")
+                except msgspec.DecodeError as e:
+                    response.failure(f"Invalid legacy response format: {e}")
             else:
                 response.failure(f"Legacy endpoint failed: {response.status_code}")
     
     def generate_test_data(self):
         """
-        Generate realistic test data for predictions
+        Pick a realistic JSON-encoded test payload from the pre-built pool
         """
-        
-        # Realistic value distributions based on census data
-        workclass_options = ["Private", "Self-emp-not-inc", "Self-emp-inc", "Federal-gov", "Local-gov", "State-gov"]
-        education_options = ["Bachelors", "Some-college", "11th", "HS-grad", "Prof-school", "Assoc-acdm", "Assoc-voc", "9th", "7th-8th", "12th", "Masters", "1st-4th", "10th", "Doctorate", "5th-6th", "Preschool"]
-        marital_status_options = ["Married-civ-spouse", "Divorced", "Never-married", "Separated", "Widowed", "Married-spouse-absent", "Married-AF-spouse"]
-        occupation_options = ["Tech-support", "Craft-repair", "Other-service", "Sales", "Exec-managerial", "Prof-specialty", "Handlers-cleaners", "Machine-op-inspct", "Adm-clerical", "Farming-fishing", "Transport-moving", "Priv-house-serv", "Protective-serv", "Armed-Forces"]
-        relationship_options = ["Wife", "Own-child", "Husband", "Not-in-family", "Other-relative", "Unmarried"]
-        race_options = ["White", "Asian-Pac-Islander", "Amer-Indian-Eskimo", "Other", "Black"]
-        sex_options = ["Female", "Male"]
-        country_options = ["United-States", "Cambodia", "England", "Puerto-Rico", "Canada", "Germany", "Outlying-US(Guam-USVI-etc)", "India", "Japan", "Greece", "South", "China", "Cuba", "Iran", "Honduras", "Philippines", "Italy", "Poland", "Jamaica", "Vietnam", "Mexico", "Portugal", "Ireland", "France", "Dominican-Republic", "Laos", "Ecuador", "Taiwan", "Haiti", "Columbia", "Hungary", "Guatemala", "Nicaragua", "Scotland", "Thailand", "Yugoslavia", "El-Salvador", "Trinadad&Tobago", "Peru", "Hong", "Holand-Netherlands"]
-        
-        return {
-            "age": random.randint(17, 90),
-            "workclass": random.choice(workclass_options),
-            "fnlgt": random.randint(12285, 1484705),
-            "education": random.choice(education_options),
-            "education-num": random.randint(1, 16),
-            "marital-status": random.choice(marital_status_options),
-            "occupation": random.choice(occupation_options),
-            "relationship": random.choice(relationship_options),
-            "race": random.choice(race_options),
-            "sex": random.choice(sex_options),
-            "capital-gain": random.randint(0, 99999) if random.random() < 0.1 else 0,
-            "capital-loss": random.randint(0, 4356) if random.random() < 0.1 else 0,
-            "hours-per-week": random.randint(1, 99),
-            "native-country": random.choice(country_options)
-        }
-
-
-class StressTestUser(HttpUser):
+        return next_payload()
+
+
+class StressTestUser(APIUser):
     """
     Stress test user with aggressive load patterns
     """
@@ -151,27 +310,10 @@ class StressTestUser(HttpUser):
     @task
     def rapid_predictions(self):
         """Rapid-fire predictions for stress testing"""
-        test_data = {
-            "age": 39,
-            "workclass": "State-gov",
-            "fnlgt": 77516,
-            "education": "Bachelors",
-            "education-num": 13,
-            "marital-status": "Never-married",
-            "occupation": "Adm-clerical",
-            "relationship": "Not-in-family",
-            "race": "White",
-            "sex": "Male",
-            "capital-gain": 2174,
-            "capital-loss": 0,
-            "hours-per-week": 40,
-            "native-country": "United-States"
-        }
-        
-        self.client.post("/v1/predict", json=test_data)
+        self.client.post("/v1/predict", data=STRESS_PAYLOAD, headers=JSON_HEADERS)
 
 
-class HealthCheckUser(HttpUser):
+class HealthCheckUser(APIUser):
     """
     User that only performs health checks - useful for monitoring
     """
@@ -189,7 +331,7 @@ class HealthCheckUser(HttpUser):
         self.client.get("/v1/metrics")
 
 
-class ConcurrentUser(HttpUser):
+class ConcurrentUser(APIUser):
     """
     User simulating concurrent access patterns
     """
@@ -238,6 +380,8 @@ class ConcurrentUser(HttpUser):
                 }
             }
         ]
+        for test_case in self.test_cases:
+            test_case["payload"] = orjson.dumps(test_case["data"])
     
     @task
     def test_prediction_scenarios(self):
@@ -246,11 +390,20 @@ class ConcurrentUser(HttpUser):
         
         with self.client.post(
             "/v1/predict",
-            json=test_case["data"],
-            name=f"predict_{test_case['name']}"
+            data=test_case["payload"],
+            headers=JSON_HEADERS,
+            name=f"predict_{test_case['name']}",
+            catch_response=True
         ) as response:
             if response.status_code == 200:
-                result = response.json()
-                # Log interesting results for analysis
-                if result.get("confidence", 0) < 0.6:
-                    print(f"Low confidence prediction for {test_case['name']}: {result.get('confidence')}")
+                try:
+                    result = msgspec.json.decode(response.content, type=PredictResponse)
+                except msgspec.DecodeError as e:
+                    response.failure(f"Invalid response format: {e}")
+                else:
+                    # Log interesting results for analysis
+                    if result.confidence < 0.6:
+                        print(f"Low confidence prediction for {test_case['name']}: {result.confidence}")
+                    response.success()
+            else:
+                response.failure(f"HTTP {response.status_code}")
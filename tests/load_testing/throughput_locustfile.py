@@ -0,0 +1,52 @@
+"""
+Maximum-throughput Locust users for the Census ML API
+
+Kept apart from locustfile.py, whose users model a realistic mixed workload;
+these users have no think time and would dominate any run they are part of.
+
+Usage:
+    locust -f tests/load_testing/throughput_locustfile.py --host=http://localhost:8000 -u 500 PredictUser --tags throughput
+    
+Peak RPS from one generator (BurstUser sends BURST_SIZE requests per task, amortizing
+task scheduling at the cost of coarser ramp-up and stop granularity):
+    locust -f tests/load_testing/throughput_locustfile.py --host=http://localhost:8000 -u 100 BurstUser
+    
+Add --disable-gc to keep garbage-collection pauses out of short measurement runs.
+"""
+
+from locust import task, tag, constant
+
+# Shares the payload pool, connection settings and command-line options
+from locustfile import APIUser, JSON_HEADERS, next_payload
+
+
+class PredictUser(APIUser):
+    """
+    Prediction-only user with no think time, for measuring maximum throughput
+    """
+    
+    wait_time = constant(0)
+    
+    @tag("throughput")
+    @task
+    def predict(self):
+        """Back-to-back predictions over the payload pool"""
+        self.client.post("/v1/predict", data=next_payload(), headers=JSON_HEADERS)
+
+
+# Requests issued back to back by each BurstUser task
+BURST_SIZE = 16
+
+
+class BurstUser(APIUser):
+    """
+    Sends predictions in bursts of BURST_SIZE per task, for peak RPS measurement
+    """
+    
+    wait_time = constant(0)
+    
+    @task
+    def burst(self):
+        """Back-to-back predictions without returning to the task scheduler"""
+        for _ in range(BURST_SIZE):
+            self.client.post("/v1/predict", data=next_payload(), headers=JSON_HEADERS)
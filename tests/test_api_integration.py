@@ -2,114 +2,196 @@
 Integration tests for Census ML API
 
 Run with: pytest tests/test_api_integration.py -v
+
+Or in parallel with pytest-xdist, keeping the load-style tests on one worker:
+    pytest tests/test_api_integration.py -v -n auto --dist=loadgroup
 """
 
+import asyncio
+
+import msgspec
+import orjson
 import pytest
 import requests
 import json
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any
 
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
 # Configuration
 API_BASE_URL = "http://localhost:8000"
 TIMEOUT = 30
+POOL_SIZE = 32
+
+# Payloads reused across tests, JSON-encoded once per session
+PAYLOADS = {
+    "married_hs_grad": json.dumps({
+        "age": 37,
+        "workclass": "Private",
+        "fnlgt": 178356,
+        "education": "HS-grad",
+        "education-num": 10,
+        "marital-status": "Married-civ-spouse",
+        "occupation": "Prof-specialty",
+        "relationship": "Husband",
+        "race": "White",
+        "sex": "Male",
+        "capital-gain": 0,
+        "capital-loss": 0,
+        "hours-per-week": 40,
+        "native-country": "United-States"
+    }).encode(),
+    "masters_exec": json.dumps({
+        "age": 45,
+        "workclass": "Private",
+        "fnlgt": 200000,
+        "education": "Masters",
+        "education-num": 14,
+        "marital-status": "Married-civ-spouse",
+        "occupation": "Exec-managerial",
+        "relationship": "Husband",
+        "race": "White",
+        "sex": "Male",
+        "capital-gain": 15024,
+        "capital-loss": 0,
+        "hours-per-week": 50,
+        "native-country": "United-States"
+    }).encode(),
+    "divorced_sales": json.dumps({
+        "age": 35,
+        "workclass": "Private",
+        "fnlgt": 120000,
+        "education": "Some-college",
+        "education-num": 10,
+        "marital-status": "Divorced",
+        "occupation": "Sales",
+        "relationship": "Not-in-family",
+        "race": "White",
+        "sex": "Female",
+        "capital-gain": 0,
+        "capital-loss": 0,
+        "hours-per-week": 35,
+        "native-country": "United-States"
+    }).encode(),
+    "married_bachelors": json.dumps({
+        "age": 40,
+        "workclass": "Private",
+        "fnlgt": 180000,
+        "education": "Bachelors",
+        "education-num": 13,
+        "marital-status": "Married-civ-spouse",
+        "occupation": "Prof-specialty",
+        "relationship": "Husband",
+        "race": "White",
+        "sex": "Male",
+        "capital-gain": 5000,
+        "capital-loss": 0,
+        "hours-per-week": 45,
+        "native-country": "United-States"
+    }).encode()
+}
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# (path, required keys, expected values) for the read-only endpoints
+ENDPOINT_SHAPES = [
+    ("/", ["message", "version"], {"version": "1.0.0"}),
+    ("/v1/health", ["status", "timestamp", "model_loaded", "version"],
+     {"status": "healthy", "model_loaded": True}),
+    ("/v1/metrics", ["model_performance", "request_count", "prediction_distribution", "uptime_seconds"], {}),
+    ("/v1/model/info", ["model_type", "features", "target_classes", "model_version"],
+     {"model_type": "RandomForestClassifier"}),
+]
+
+
+@pytest.fixture(scope="session")
+def session():
+    """Keep-alive HTTP session shared by the tests"""
+    session = requests.Session()
+    # The API is local; skip proxy/netrc environment lookups on every request
+    session.trust_env = False
+    session.mount("http://", HTTPAdapter(
+        pool_connections=POOL_SIZE,
+        pool_maxsize=POOL_SIZE,
+        pool_block=False,
+        max_retries=Retry(total=0, connect=0, read=0, redirect=0)
+    ))
+    yield session
+    session.close()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def api_ready(session):
+    """Wait once per test run for the API to be ready"""
+    max_retries = 10
+    for i in range(max_retries):
+        try:
+            response = session.get(f"{API_BASE_URL}/", timeout=5)
+            if response.status_code == 200:
+                return
+        except requests.exceptions.RequestException:
+            pass
+        # Exponential backoff, capped at 2 seconds
+        time.sleep(min(2 ** i * 0.1, 2))
+    pytest.skip("API is not available")
+
+
+@pytest.fixture(scope="session")
+def openapi_spec(session):
+    """OpenAPI document, fetched once per test run"""
+    response = session.get(f"{API_BASE_URL}/openapi.json")
+    response.raise_for_status()
+    return orjson.loads(response.content)
+
+
+@pytest.fixture(scope="session")
+def endpoint_json(session):
+    """Decoded GET responses for the read-only endpoints, fetched once per path"""
+    cache = {}
+
+    def get(path):
+        if path not in cache:
+            response = session.get(f"{API_BASE_URL}{path}")
+            assert response.status_code == 200
+            cache[path] = msgspec.json.decode(response.content)
+        return cache[path]
+
+    return get
 
 
 class TestAPIIntegration:
     """Integration tests for the Census ML API"""
     
-    @pytest.fixture(autouse=True)
-    def setup(self):
-        """Setup for each test"""
-        # Wait for API to be ready
-        max_retries = 10
-        for i in range(max_retries):
-            try:
-                response = requests.get(f"{API_BASE_URL}/", timeout=5)
-                if response.status_code == 200:
-                    break
-            except requests.exceptions.RequestException:
-                if i == max_retries - 1:
-                    pytest.skip("API is not available")
-                time.sleep(2)
+    @pytest.mark.parametrize("path,required_keys,expected", ENDPOINT_SHAPES)
+    def test_endpoint_shape(self, endpoint_json, path, required_keys, expected):
+        """Test that the read-only endpoints return the documented fields"""
+        data = endpoint_json(path)
+        for key in required_keys:
+            assert key in data
+        for key, value in expected.items():
+            assert data[key] == value
     
-    def test_root_endpoint(self):
-        """Test the root endpoint"""
-        response = requests.get(f"{API_BASE_URL}/")
-        
-        assert response.status_code == 200
-        data = response.json()
-        assert "message" in data
-        assert "version" in data
-        assert data["version"] == "1.0.0"
-    
-    def test_health_endpoint(self):
-        """Test the health check endpoint"""
-        response = requests.get(f"{API_BASE_URL}/v1/health")
-        
-        assert response.status_code == 200
-        data = response.json()
-        assert "status" in data
-        assert "timestamp" in data
-        assert "model_loaded" in data
-        assert "version" in data
-        assert data["status"] in ["healthy", "unhealthy"]
-        assert data["model_loaded"] is True
-    
-    def test_metrics_endpoint(self):
-        """Test the metrics endpoint"""
-        response = requests.get(f"{API_BASE_URL}/v1/metrics")
-        
-        assert response.status_code == 200
-        data = response.json()
-        assert "model_performance" in data
-        assert "request_count" in data
-        assert "prediction_distribution" in data
-        assert "uptime_seconds" in data
-        
-        # Check model performance structure
-        perf = data["model_performance"]
+    def test_metrics_endpoint(self, endpoint_json):
+        """Test the metrics model performance structure"""
+        perf = endpoint_json("/v1/metrics")["model_performance"]
         assert "precision" in perf
         assert "recall" in perf
         assert "f1_score" in perf
     
-    def test_model_info_endpoint(self):
-        """Test the model info endpoint"""
-        response = requests.get(f"{API_BASE_URL}/v1/model/info")
-        
-        assert response.status_code == 200
-        data = response.json()
-        assert "model_type" in data
-        assert "features" in data
-        assert "target_classes" in data
-        assert "model_version" in data
-        assert data["model_type"] == "RandomForestClassifier"
+    def test_model_info_endpoint(self, endpoint_json):
+        """Test the model info features and classes"""
+        data = endpoint_json("/v1/model/info")
         assert len(data["features"]) == 14
         assert set(data["target_classes"]) == {">50K", "<=50K"}
     
-    def test_prediction_endpoint_valid_data(self):
+    def test_prediction_endpoint_valid_data(self, session):
         """Test prediction endpoint with valid data"""
-        test_data = {
-            "age": 37,
-            "workclass": "Private",
-            "fnlgt": 178356,
-            "education": "HS-grad",
-            "education-num": 10,
-            "marital-status": "Married-civ-spouse",
-            "occupation": "Prof-specialty",
-            "relationship": "Husband",
-            "race": "White",
-            "sex": "Male",
-            "capital-gain": 0,
-            "capital-loss": 0,
-            "hours-per-week": 40,
-            "native-country": "United-States"
-        }
-        
-        response = requests.post(
+        response = session.post(
             f"{API_BASE_URL}/v1/predict",
-            json=test_data,
-            headers={"Content-Type": "application/json"}
+            data=PAYLOADS["married_hs_grad"],
+            headers=JSON_HEADERS
         )
         
         assert response.status_code == 200
@@ -121,7 +203,7 @@ class TestAPIIntegration:
         assert data["prediction"] in [">50K", "<=50K"]
         assert 0.0 <= data["confidence"] <= 1.0
     
-    def test_prediction_endpoint_missing_fields(self):
+    def test_prediction_endpoint_missing_fields(self, session):
         """Test prediction endpoint with missing required fields"""
         incomplete_data = {
             "age": 37,
@@ -129,7 +211,7 @@ class TestAPIIntegration:
             # Missing other required fields
         }
         
-        response = requests.post(
+        response = session.post(
             f"{API_BASE_URL}/v1/predict",
             json=incomplete_data,
             headers={"Content-Type": "application/json"}
@@ -137,7 +219,7 @@ class TestAPIIntegration:
         
         assert response.status_code == 422  # Validation error
     
-    def test_prediction_endpoint_invalid_data_types(self):
+    def test_prediction_endpoint_invalid_data_types(self, session):
         """Test prediction endpoint with invalid data types"""
         invalid_data = {
             "age": "not_a_number",  # Should be int
@@ -156,37 +238,44 @@ class TestAPIIntegration:
             "native-country": "United-States"
         }
         
-        response = requests.post(
+        response = session.post(
             f"{API_BASE_URL}/v1/predict",
             json=invalid_data,
             headers={"Content-Type": "application/json"}
         )
         
         assert response.status_code == 422  # Validation error
+        assert "$.age" in response.json()["detail"]
     
-    def test_legacy_endpoint_compatibility(self):
-        """Test the legacy endpoint for backward compatibility"""
-        test_data = {
-            "age": 37,
-            "workclass": "Private",
-            "fnlgt": 178356,
-            "education": "HS-grad",
-            "education-num": 10,
-            "marital-status": "Married-civ-spouse",
-            "occupation": "Prof-specialty",
-            "relationship": "Husband",
-            "race": "White",
-            "sex": "Male",
-            "capital-gain": 0,
-            "capital-loss": 0,
-            "hours-per-week": 40,
-            "native-country": "United-States"
-        }
+    def test_prediction_endpoint_numeric_strings(self, session):
+        """Test that numeric strings are accepted for integer fields"""
+        test_data = orjson.loads(PAYLOADS["married_hs_grad"])
+        test_data["age"] = "37"
+        
+        response = session.post(f"{API_BASE_URL}/v1/predict", json=test_data)
         
-        response = requests.post(
+        assert response.status_code == 200
+    
+    def test_cache_clear_endpoint(self, session):
+        """Test that clearing the cache drops the prediction just cached"""
+        response = session.post(
+            f"{API_BASE_URL}/v1/predict",
+            data=PAYLOADS["married_hs_grad"],
+            headers=JSON_HEADERS
+        )
+        assert response.status_code == 200
+        
+        response = session.post(f"{API_BASE_URL}/v1/cache/clear")
+        
+        assert response.status_code == 200
+        assert response.json()["cleared"] >= 1
+    
+    def test_legacy_endpoint_compatibility(self, session):
+        """Test the legacy endpoint for backward compatibility"""
+        response = session.post(
             f"{API_BASE_URL}/data/",
-            json=test_data,
-            headers={"Content-Type": "application/json"}
+            data=PAYLOADS["married_hs_grad"],
+            headers=JSON_HEADERS
         )
         
         assert response.status_code == 200
@@ -194,45 +283,24 @@ class TestAPIIntegration:
         assert "result" in data
         assert data["result"] in [">50K", "<=50K"]
     
-    def test_prediction_consistency(self):
+    def test_prediction_consistency(self, session):
         """Test that the same input produces consistent results"""
-        test_data = {
-            "age": 45,
-            "workclass": "Private",
-            "fnlgt": 200000,
-            "education": "Masters",
-            "education-num": 14,
-            "marital-status": "Married-civ-spouse",
-            "occupation": "Exec-managerial",
-            "relationship": "Husband",
-            "race": "White",
-            "sex": "Male",
-            "capital-gain": 15024,
-            "capital-loss": 0,
-            "hours-per-week": 50,
-            "native-country": "United-States"
-        }
-        
-        # Make multiple predictions with the same data
-        responses = []
-        for _ in range(5):
-            response = requests.post(
-                f"{API_BASE_URL}/v1/predict",
-                json=test_data,
-                headers={"Content-Type": "application/json"}
-            )
-            assert response.status_code == 200
-            responses.append(response.json())
+        # Score the same record several times in one batch request
+        payload = b"[" + b",".join([PAYLOADS["masters_exec"]] * 5) + b"]"
+        response = session.post(
+            f"{API_BASE_URL}/v1/predict/batch",
+            data=payload,
+            headers=JSON_HEADERS
+        )
+        assert response.status_code == 200
+        predictions = response.json()["predictions"]
+        assert len(predictions) == 5
         
         # Check that predictions are consistent
-        first_prediction = responses[0]["prediction"]
-        first_confidence = responses[0]["confidence"]
-        
-        for response in responses[1:]:
-            assert response["prediction"] == first_prediction
-            assert response["confidence"] == first_confidence
+        assert len({p["prediction"] for p in predictions}) == 1
+        assert len({p["confidence"] for p in predictions}) == 1
     
-    def test_api_performance(self):
+    def test_api_performance(self, session):
         """Test API response time performance"""
         test_data = {
             "age": 30,
@@ -252,82 +320,37 @@ class TestAPIIntegration:
         }
         
         # Measure response time
-        start_time = time.time()
-        response = requests.post(
+        start_ns = time.perf_counter_ns()
+        response = session.post(
             f"{API_BASE_URL}/v1/predict",
             json=test_data,
             headers={"Content-Type": "application/json"}
         )
-        end_time = time.time()
+        response_time = (time.perf_counter_ns() - start_ns) / 1e9
         
         assert response.status_code == 200
-        response_time = end_time - start_time
         assert response_time < 1.0  # Should respond within 1 second
     
-    def test_concurrent_requests(self):
+    @pytest.mark.xdist_group("serial")
+    def test_concurrent_requests(self, session):
         """Test handling of concurrent requests"""
-        import threading
-        import queue
+        num_requests = 10
         
-        test_data = {
-            "age": 35,
-            "workclass": "Private",
-            "fnlgt": 120000,
-            "education": "Some-college",
-            "education-num": 10,
-            "marital-status": "Divorced",
-            "occupation": "Sales",
-            "relationship": "Not-in-family",
-            "race": "White",
-            "sex": "Female",
-            "capital-gain": 0,
-            "capital-loss": 0,
-            "hours-per-week": 35,
-            "native-country": "United-States"
-        }
-        
-        results = queue.Queue()
-        
-        def make_request():
-            try:
-                response = requests.post(
-                    f"{API_BASE_URL}/v1/predict",
-                    json=test_data,
-                    headers={"Content-Type": "application/json"},
-                    timeout=10
-                )
-                results.put(("success", response.status_code))
-            except Exception as e:
-                results.put(("error", str(e)))
-        
-        # Create multiple threads to make concurrent requests
-        threads = []
-        num_threads = 10
-        
-        for _ in range(num_threads):
-            thread = threading.Thread(target=make_request)
-            threads.append(thread)
-            thread.start()
-        
-        # Wait for all threads to complete
-        for thread in threads:
-            thread.join(timeout=15)
-        
-        # Check results
-        success_count = 0
-        while not results.empty():
-            result_type, result_value = results.get()
-            if result_type == "success":
-                assert result_value == 200
-                success_count += 1
+        # Issue the requests from a worker pool over the shared keep-alive session
+        with ThreadPoolExecutor(max_workers=num_requests) as executor:
+            results = list(executor.map(
+                lambda _: session.post(f"{API_BASE_URL}/v1/predict", data=PAYLOADS["divorced_sales"],
+                                       headers=JSON_HEADERS, timeout=10),
+                range(num_requests)
+            ))
         
         # At least 80% of requests should succeed
-        assert success_count >= num_threads * 0.8
+        assert sum(r.status_code == 200 for r in results) >= num_requests * 0.8
     
-    def test_error_handling(self):
+    def test_error_handling(self, session):
         """Test various error conditions"""
         # Test with malformed JSON
-        response = requests.post(
+        response = session.post(
             f"{API_BASE_URL}/v1/predict",
             data="invalid json",
             headers={"Content-Type": "application/json"}
@@ -335,7 +358,7 @@ class TestAPIIntegration:
         assert response.status_code == 422
         
         # Test with empty payload
-        response = requests.post(
+        response = session.post(
             f"{API_BASE_URL}/v1/predict",
             json={},
             headers={"Content-Type": "application/json"}
@@ -343,15 +366,11 @@ class TestAPIIntegration:
         assert response.status_code == 422
         
         # Test non-existent endpoint
-        response = requests.get(f"{API_BASE_URL}/v1/nonexistent")
+        response = session.get(f"{API_BASE_URL}/v1/nonexistent")
         assert response.status_code == 404
     
-    def test_openapi_documentation(self):
+    def test_openapi_documentation(self, openapi_spec):
         """Test that OpenAPI documentation is available"""
-        response = requests.get(f"{API_BASE_URL}/openapi.json")
-        assert response.status_code == 200
-        
-        openapi_spec = response.json()
         assert "openapi" in openapi_spec
         assert "info" in openapi_spec
         assert "paths" in openapi_spec
@@ -367,59 +386,27 @@ class TestAPIIntegration:
 class TestLoadScenarios:
     """Load testing scenarios using requests"""
 
-    @pytest.fixture(autouse=True)
-    def setup(self):
-        """Setup for each test"""
-        # Wait for API to be ready
-        max_retries = 10
-        for i in range(max_retries):
-            try:
-                response = requests.get(f"{API_BASE_URL}/", timeout=5)
-                if response.status_code == 200:
-                    break
-            except requests.exceptions.RequestException:
-                if i == max_retries - 1:
-                    pytest.skip("API is not available")
-                time.sleep(2)
-
+    @pytest.mark.xdist_group("serial")
     def test_burst_load(self):
         """Test handling burst load"""
-        test_data = {
-            "age": 40,
-            "workclass": "Private",
-            "fnlgt": 180000,
-            "education": "Bachelors",
-            "education-num": 13,
-            "marital-status": "Married-civ-spouse",
-            "occupation": "Prof-specialty",
-            "relationship": "Husband",
-            "race": "White",
-            "sex": "Male",
-            "capital-gain": 5000,
-            "capital-loss": 0,
-            "hours-per-week": 45,
-            "native-country": "United-States"
-        }
-        
-        # Send 20 requests in rapid succession
-        start_time = time.time()
-        successful_requests = 0
-        
-        for _ in range(20):
-            try:
-                response = requests.post(
-                    f"{API_BASE_URL}/v1/predict",
-                    json=test_data,
-                    headers={"Content-Type": "application/json"},
-                    timeout=5
+        # httpx is a test-only dependency (requirements-test.txt)
+        httpx = pytest.importorskip("httpx")
+        payload = PAYLOADS["married_bachelors"]
+        num_requests = 20
+        
+        async def send_burst():
+            limits = httpx.Limits(max_keepalive_connections=num_requests, max_connections=num_requests)
+            async with httpx.AsyncClient(base_url=API_BASE_URL, limits=limits, timeout=5) as client:
+                return await asyncio.gather(
+                    *[client.post("/v1/predict", content=payload, headers=JSON_HEADERS) for _ in range(num_requests)],
+                    return_exceptions=True
                 )
-                if response.status_code == 200:
-                    successful_requests += 1
-            except requests.exceptions.RequestException:
-                pass
         
-        end_time = time.time()
-        total_time = end_time - start_time
+        # Send all 20 requests concurrently
+        start_ns = time.perf_counter_ns()
+        results = asyncio.run(send_burst())
+        total_time = (time.perf_counter_ns() - start_ns) / 1e9
+        successful_requests = sum(getattr(r, "status_code", 0) == 200 for r in results)
         
         # Should handle at least 15 out of 20 requests successfully
         assert successful_requests >= 15